@@ -4,38 +4,89 @@ Debugging and troubleshooting utilities for MCP Stock Server
 This helps identify and fix common issues
 """
 
+import os
+# Select the headless backend before anything imports matplotlib
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+import atexit
 import json
 import sys
+import importlib.util
+import time
 import traceback
 import asyncio
 import subprocess
 from datetime import datetime, timedelta
 import logging
 
+from script_utils import dump_json, parse_dates_bulk
+
 # Setup logging
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# (fig, ax) pairs keyed by figsize, reused across plots instead of rebuilt
+_plot_pool = {}
+
+# Sample data for the test plot, allocated once on first use
+_TEST_X = None
+_TEST_Y = None
+
+def get_pooled_figure(figsize=(8, 6)):
+    """Return a reusable (fig, ax) pair for figsize, creating it on first use"""
+    import matplotlib.pyplot as plt
+    
+    if figsize not in _plot_pool:
+        if not _plot_pool:
+            # Pooled figures are never closed per plot, only at exit
+            atexit.register(plt.close, 'all')
+        _plot_pool[figsize] = plt.subplots(figsize=figsize)
+    return _plot_pool[figsize]
+
+def encode_figure_png(fig) -> bytes:
+    """PNG-encode a figure straight from its Agg canvas buffer.
+
+    Skips matplotlib's savefig pipeline: the canvas is drawn once, its RGBA
+    buffer is viewed as a NumPy array and Pillow encodes it with a fast
+    (low) zlib compression level.
+    """
+    import io
+    import numpy as np
+    from PIL import Image
+
+    fig.canvas.draw()
+    width, height = fig.canvas.get_width_height()
+    rgba = np.frombuffer(fig.canvas.buffer_rgba(), dtype=np.uint8).reshape(height, width, 4)
+
+    buffer = io.BytesIO()
+    Image.fromarray(rgba).save(buffer, format='PNG', optimize=False, compress_level=1)
+    return buffer.getvalue()
+
 class MCPDebugger:
     """Debug utilities for MCP servers"""
     
     def __init__(self):
         self.test_results = []
     
+    @staticmethod
+    def status_label(success: bool) -> str:
+        """Human readable status for a result"""
+        return "✅ PASS" if success else "❌ FAIL"
+    
     def log_test(self, test_name: str, success: bool, details: str = ""):
-        """Log test results"""
-        status = "✅ PASS" if success else "❌ FAIL"
+        """Log test results (integer ns timestamp; ISO formatting happens at report time)"""
         result = {
             "test": test_name,
-            "status": status,
             "success": success,
             "details": details,
-            "timestamp": datetime.now().isoformat()
+            "timestamp_ns": time.time_ns()
         }
         self.test_results.append(result)
-        print(f"{status}: {test_name}")
+        line = f"{self.status_label(success)}: {test_name}"
         if details:
-            print(f"   Details: {details}")
+            line += f"\n   Details: {details}"
+        # Single write keeps concurrent phases from splitting a result's lines
+        sys.stdout.write(line + "\n")
     
     def test_imports(self):
         """Test all required imports"""
@@ -52,20 +103,14 @@ class MCPDebugger:
             ("base64", "base64")
         ]
         
-        for module, alias in imports_to_test:
+        # find_spec only locates the module on sys.path; the heavy packages are
+        # really imported by the tests that exercise them
+        for module, _ in imports_to_test:
             try:
-                if alias == "yf":
-                    import yfinance as yf
-                elif alias == "plt":
-                    import matplotlib.pyplot as plt
-                elif alias == "pd":
-                    import pandas as pd
-                elif alias == "np":
-                    import numpy as np
+                if importlib.util.find_spec(module) is not None:
+                    self.log_test(f"Import {module}", True)
                 else:
-                    __import__(module)
-                
-                self.log_test(f"Import {module}", True)
+                    self.log_test(f"Import {module}", False, f"No module named '{module}'")
             except ImportError as e:
                 self.log_test(f"Import {module}", False, str(e))
             except Exception as e:
@@ -76,20 +121,25 @@ class MCPDebugger:
         print("\n🌐 Testing Yahoo Finance...")
         
         try:
-            import yfinance as yf
+            from ticker_cache import get_ticker, get_fast_info, get_info, get_history
             
             # Test 1: Basic ticker creation
-            ticker = yf.Ticker("AAPL")
+            ticker = get_ticker("AAPL")
             self.log_test("Yahoo Finance Ticker Creation", True)
             
-            # Test 2: Get basic info
+            # Test 2: Get basic info (fast_info skips the heavy company-profile fetch)
             try:
-                info = ticker.info
-                if info and len(info) > 0:
-                    company_name = info.get('longName', 'Unknown')
-                    self.log_test("Yahoo Finance Info Fetch", True, f"Company: {company_name}")
-                else:
-                    self.log_test("Yahoo Finance Info Fetch", False, "Empty info returned")
+                try:
+                    fast_info = get_fast_info("AAPL")
+                    self.log_test("Yahoo Finance Info Fetch", True, 
+                                f"Last price: {fast_info.last_price:.2f} {fast_info.currency}")
+                except Exception:
+                    info = get_info("AAPL")
+                    if info and len(info) > 0:
+                        company_name = info.get('longName', 'Unknown')
+                        self.log_test("Yahoo Finance Info Fetch", True, f"Company: {company_name}")
+                    else:
+                        self.log_test("Yahoo Finance Info Fetch", False, "Empty info returned")
             except Exception as e:
                 self.log_test("Yahoo Finance Info Fetch", False, str(e))
             
@@ -99,7 +149,8 @@ class MCPDebugger:
                 end_date = datetime.now()
                 start_date = end_date - timedelta(days=10)  # 10 days to ensure we get some data
                 
-                data = ticker.history(start=start_date, end=end_date)
+                data = get_history("AAPL", start_date.strftime('%Y-%m-%d'),
+                                   end_date.strftime('%Y-%m-%d'))
                 if not data.empty:
                     self.log_test("Yahoo Finance Historical Data", True, 
                                 f"Got {len(data)} data points")
@@ -117,17 +168,6 @@ class MCPDebugger:
         """Test date parsing functionality"""
         print("\n📅 Testing Date Parsing...")
         
-        def parse_date(date_str: str) -> str:
-            """Test version of date parsing"""
-            try:
-                month = date_str[:2]
-                day = date_str[2:4]
-                year = date_str[4:]
-                dt = datetime(int(year), int(month), int(day))
-                return dt.strftime('%Y-%m-%d')
-            except Exception as e:
-                raise ValueError(f"Invalid date format: {date_str}. Error: {str(e)}")
-        
         test_cases = [
             ("01012024", "2024-01-01", "Valid date - Jan 1, 2024"),
             ("12312023", "2023-12-31", "Valid date - Dec 31, 2023"),
@@ -139,60 +179,90 @@ class MCPDebugger:
             ("abc12024", None, "Non-numeric input")
         ]
         
-        for input_date, expected, description in test_cases:
-            try:
-                result = parse_date(input_date)
-                if expected is None:
-                    self.log_test(f"Date Parse: {description}", False, 
-                                f"Should have failed but got: {result}")
-                elif result == expected:
-                    self.log_test(f"Date Parse: {description}", True)
-                else:
-                    self.log_test(f"Date Parse: {description}", False, 
-                                f"Expected {expected}, got {result}")
-            except Exception as e:
+        # Parse every case in one vectorized call, then just report per case
+        try:
+            import numpy as np
+            
+            inputs = np.array([case[0] for case in test_cases], dtype='S8')
+            valid, parsed = parse_dates_bulk(inputs)
+            # 'S8' pads short strings (caught by the digit check) but would
+            # silently truncate long ones, so check the length separately
+            valid &= np.array([len(case[0]) == 8 for case in test_cases])
+            formatted = np.datetime_as_string(parsed, unit='D')
+        except Exception as e:
+            self.log_test("Date Parse: Bulk parser", False, str(e))
+            return
+        
+        for i, (input_date, expected, description) in enumerate(test_cases):
+            if not valid[i]:
                 if expected is None:
                     self.log_test(f"Date Parse: {description}", True, "Correctly failed")
                 else:
-                    self.log_test(f"Date Parse: {description}", False, str(e))
+                    self.log_test(f"Date Parse: {description}", False, 
+                                f"Invalid date format: {input_date}")
+            elif expected is None:
+                self.log_test(f"Date Parse: {description}", False, 
+                            f"Should have failed but got: {formatted[i]}")
+            elif formatted[i] == expected:
+                self.log_test(f"Date Parse: {description}", True)
+            else:
+                self.log_test(f"Date Parse: {description}", False, 
+                            f"Expected {expected}, got {formatted[i]}")
     
     def test_matplotlib(self):
         """Test matplotlib functionality"""
         print("\n📊 Testing Matplotlib...")
         
         try:
-            import matplotlib
-            matplotlib.use('Agg')  # Use non-interactive backend
-            import matplotlib.pyplot as plt
             import numpy as np
             import io
             import base64
             
-            # Create a simple test plot
-            fig, ax = plt.subplots(figsize=(8, 6))
-            x = np.linspace(0, 10, 100)
-            y = np.sin(x)
-            ax.plot(x, y)
+            # Create a simple test plot on the pooled figure
+            global _TEST_X, _TEST_Y
+            if _TEST_X is None:
+                _TEST_X = np.linspace(0, 10, 100)
+                _TEST_Y = np.empty_like(_TEST_X)
+            np.sin(_TEST_X, out=_TEST_Y)
+            
+            fig, ax = get_pooled_figure((8, 6))
+            ax.clear()
+            ax.plot(_TEST_X, _TEST_Y)
             ax.set_title("Test Plot")
             
-            # Convert to base64
+            # Reference timing for the classic savefig path
+            start = time.perf_counter()
             buffer = io.BytesIO()
-            plt.savefig(buffer, format='png', dpi=100)
-            buffer.seek(0)
-            plot_base64 = base64.b64encode(buffer.getvalue()).decode()
-            plt.close()
+            fig.savefig(buffer, format='png', dpi=100)
+            savefig_time = time.perf_counter() - start
+            png_bytes = buffer.getvalue()
+            method = "savefig"
+            
+            # Preferred path: Agg canvas buffer + Pillow encode
+            try:
+                start = time.perf_counter()
+                png_bytes = encode_figure_png(fig)
+                canvas_time = time.perf_counter() - start
+                method = "canvas"
+                logger.debug(f"PNG encode: savefig {savefig_time*1000:.1f}ms, "
+                             f"canvas+PIL {canvas_time*1000:.1f}ms")
+            except ImportError:
+                logger.debug("Pillow not available, using savefig PNG path")
+            
+            # Convert to base64
+            plot_base64 = base64.b64encode(png_bytes).decode()
             
             if plot_base64 and len(plot_base64) > 100:
                 self.log_test("Matplotlib Plot Generation", True, 
-                            f"Generated {len(plot_base64)} chars of base64 data")
+                            f"Generated {len(plot_base64)} chars of base64 data via {method}")
             else:
                 self.log_test("Matplotlib Plot Generation", False, "Plot generation failed")
                 
         except Exception as e:
             self.log_test("Matplotlib Test", False, str(e))
     
-    async def test_mcp_server_startup(self, server_path="stock_server.py"):
-        """Test MCP server startup"""
+    def test_mcp_server_startup(self, server_path="stock_server.py", framed=False):
+        """Test MCP server startup with a single request/response round trip"""
         print("\n🚀 Testing MCP Server Startup...")
         
         if not os.path.exists(server_path):
@@ -201,36 +271,37 @@ class MCPDebugger:
         
         self.log_test("MCP Server File Exists", True)
         
+        from example_client import encode_message, decode_first_message
+        
+        list_tools_request = {
+            "jsonrpc": "2.0",
+            "id": 1,
+            "method": "tools/list",
+            "params": {}
+        }
+        
         try:
-            # Try to start server process
-            process = await asyncio.create_subprocess_exec(
-                sys.executable, server_path,
-                stdin=asyncio.subprocess.PIPE,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            
-            self.log_test("MCP Server Process Start", True)
-            
-            # Send a simple request
-            try:
-                list_tools_request = {
-                    "jsonrpc": "2.0",
-                    "id": 1,
-                    "method": "tools/list",
-                    "params": {}
-                }
-                
-                request_json = json.dumps(list_tools_request) + '\n'
-                process.stdin.write(request_json.encode())
-                await process.stdin.drain()
+            # One-shot probe: a plain Popen is enough, no event-loop transport needed
+            with subprocess.Popen(
+                [sys.executable, server_path],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE
+            ) as process:
+                self.log_test("MCP Server Process Start", True)
                 
-                # Wait for response with timeout
                 try:
-                    response_line = await asyncio.wait_for(
-                        process.stdout.readline(), timeout=10.0
+                    out, _ = process.communicate(
+                        input=encode_message(list_tools_request, framed), timeout=10
                     )
-                    response = json.loads(response_line.decode().strip())
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                    process.communicate()
+                    self.log_test("MCP Server Response", False, "Timeout waiting for response")
+                    return
+                
+                try:
+                    response = decode_first_message(out, framed)
                     
                     if "result" in response and "tools" in response["result"]:
                         tool_count = len(response["result"]["tools"])
@@ -239,18 +310,10 @@ class MCPDebugger:
                     else:
                         self.log_test("MCP Server Tools List", False, 
                                     "Invalid response format")
-                        
-                except asyncio.TimeoutError:
-                    self.log_test("MCP Server Response", False, "Timeout waiting for response")
                 except json.JSONDecodeError as e:
                     self.log_test("MCP Server Response", False, f"JSON decode error: {str(e)}")
-            
-            except Exception as e:
-                self.log_test("MCP Server Communication", False, str(e))
-            
-            # Clean up
-            process.terminate()
-            await process.wait()
+                except Exception as e:
+                    self.log_test("MCP Server Communication", False, str(e))
             
         except Exception as e:
             self.log_test("MCP Server Startup", False, str(e))
@@ -279,46 +342,85 @@ class MCPDebugger:
         except Exception as e:
             self.log_test("FastMCP General", False, str(e))
     
-    def generate_report(self):
-        """Generate a detailed test report"""
-        print("\n" + "="*60)
-        print("🔍 MCP STOCK SERVER DEBUG REPORT")
-        print("="*60)
+    def generate_report(self, format: str = "json"):
+        """Generate a detailed test report
         
+        Args:
+            format: 'json' for a readable debug_report.json, or 'msgpack' for a
+                compact debug_report.msgpack with raw ns timestamps
+        """
         total_tests = len(self.test_results)
         passed_tests = sum(1 for result in self.test_results if result['success'])
         failed_tests = total_tests - passed_tests
         
-        print(f"\nSummary:")
-        print(f"Total Tests: {total_tests}")
-        print(f"✅ Passed: {passed_tests}")
-        print(f"❌ Failed: {failed_tests}")
-        print(f"Success Rate: {(passed_tests/total_tests*100):.1f}%")
+        # Build the whole report and write it in one go
+        lines = [
+            "",
+            "="*60,
+            "🔍 MCP STOCK SERVER DEBUG REPORT",
+            "="*60,
+            "",
+            "Summary:",
+            f"Total Tests: {total_tests}",
+            f"✅ Passed: {passed_tests}",
+            f"❌ Failed: {failed_tests}",
+            f"Success Rate: {(passed_tests/total_tests*100):.1f}%"
+        ]
         
         if failed_tests > 0:
-            print(f"\n❌ Failed Tests:")
+            lines.append("\n❌ Failed Tests:")
             for result in self.test_results:
                 if not result['success']:
-                    print(f"   • {result['test']}: {result['details']}")
+                    lines.append(f"   • {result['test']}: {result['details']}")
         
-        print(f"\n📋 Detailed Results:")
+        lines.append("\n📋 Detailed Results:")
         for result in self.test_results:
-            print(f"   {result['status']}: {result['test']}")
+            lines.append(f"   {self.status_label(result['success'])}: {result['test']}")
             if result['details']:
-                print(f"      {result['details']}")
+                lines.append(f"      {result['details']}")
+        
+        sys.stdout.write("\n".join(lines) + "\n")
+        
+        summary = {
+            "total": total_tests,
+            "passed": passed_tests, 
+            "failed": failed_tests,
+            "success_rate": passed_tests/total_tests*100
+        }
         
         # Save report to file
-        with open("debug_report.json", "w") as f:
-            json.dump({
-                "summary": {
-                    "total": total_tests,
-                    "passed": passed_tests, 
-                    "failed": failed_tests,
-                    "success_rate": passed_tests/total_tests*100
-                },
-                "results": self.test_results,
+        if format == "msgpack":
+            try:
+                import msgpack
+                report_path = "debug_report.msgpack"
+                with open(report_path, "wb") as f:
+                    f.write(msgpack.packb({
+                        "summary": summary,
+                        "results": self.test_results,
+                        "generated_at_ns": time.time_ns()
+                    }))
+                print(f"\n💾 Report saved to {report_path}")
+                return
+            except ImportError:
+                print("\n⚠️ msgpack not installed, falling back to JSON report")
+        
+        # JSON is the human readable rendering: add status labels and ISO timestamps
+        results = [
+            {
+                "test": result['test'],
+                "status": self.status_label(result['success']),
+                "success": result['success'],
+                "details": result['details'],
+                "timestamp": datetime.fromtimestamp(result['timestamp_ns'] / 1e9).isoformat()
+            }
+            for result in self.test_results
+        ]
+        with open("debug_report.json", "wb") as f:
+            dump_json({
+                "summary": summary,
+                "results": results,
                 "generated_at": datetime.now().isoformat()
-            }, f, indent=2)
+            }, f)
         
         print(f"\n💾 Report saved to debug_report.json")
 
@@ -326,20 +428,34 @@ async def main():
     """Run all debugging tests"""
     debugger = MCPDebugger()
     
+    if "--no-cache" in sys.argv:
+        from ticker_cache import set_cache_enabled
+        set_cache_enabled(False)
+    
     print("🔧 MCP Stock Server Debugger")
     print("="*50)
     
-    # Run all tests
-    debugger.test_fastmcp_import()
-    debugger.test_imports()
-    debugger.test_yahoo_finance()
-    debugger.test_date_parsing()
-    debugger.test_matplotlib()
-    await debugger.test_mcp_server_startup()
+    # Run all tests concurrently; each phase logs into its own debugger so
+    # the merged results keep a stable order without any locking
+    phases = [MCPDebugger() for _ in range(6)]
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(
+        loop.run_in_executor(None, phases[0].test_fastmcp_import),
+        loop.run_in_executor(None, phases[1].test_imports),
+        loop.run_in_executor(None, phases[2].test_yahoo_finance),
+        loop.run_in_executor(None, phases[3].test_date_parsing),
+        loop.run_in_executor(None, phases[4].test_matplotlib),
+        loop.run_in_executor(None, phases[5].test_mcp_server_startup)
+    )
+    for phase in phases:
+        debugger.test_results.extend(phase.test_results)
     
     # Generate report
-    debugger.generate_report()
+    report_format = "json"
+    for arg in sys.argv[1:]:
+        if arg.startswith("--format="):
+            report_format = arg.split("=", 1)[1]
+    debugger.generate_report(format=report_format)
 
 if __name__ == "__main__":
-    import os
     asyncio.run(main())
@@ -5,15 +5,181 @@ This demonstrates how to interact with our MCP server programmatically
 """
 
 import asyncio
+import functools
 import json
+import os
+import pickle
 import subprocess
+import sys
+import time
+from collections import OrderedDict
+from pathlib import Path
 from typing import Dict, Any
 
+try:
+    import orjson
+except ImportError:  # Fall back to the stdlib codec
+    orjson = None
+
+# StreamReader buffer bound: base64 plot responses are far larger than
+# asyncio's 64 KiB default line limit
+STREAM_LIMIT = 16 * 1024 * 1024
+
+def encode_message(message: Dict[str, Any], framed: bool = False) -> bytes:
+    """Serialize a JSON-RPC message for the server's stdin"""
+    body = orjson.dumps(message) if orjson else json.dumps(message).encode()
+    if framed:
+        return b'%d\n' % len(body) + body
+    return body + b'\n'
+
+def decode_message(data: bytes) -> Dict[str, Any]:
+    """Parse a JSON-RPC message read from the server's stdout
+    
+    Both parsers take the raw bytes (trailing newline included), so there
+    is no intermediate str decode/strip copy.
+    """
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def decode_first_message(data: bytes, framed: bool = False) -> Dict[str, Any]:
+    """Parse the first response out of a fully captured stdout buffer"""
+    first, _, rest = data.partition(b'\n')
+    if framed:
+        return decode_message(rest[:int(first)])
+    return decode_message(first)
+
+async def read_message(reader: asyncio.StreamReader, framed: bool = False) -> Dict[str, Any]:
+    """Read one response, either newline-delimited or length-framed
+    
+    Framed responses are a decimal byte count and newline followed by the
+    body, so only the short header is scanned and the body is read with a
+    single readexactly().
+    """
+    if framed:
+        header = await reader.readuntil(b'\n')
+        return decode_message(await reader.readexactly(int(header)))
+    return decode_message(await reader.readuntil(b'\n'))
+
+# On-disk cache for tools/list and resources/list responses
+SCHEMA_CACHE_PATH = Path("~/.cache/mcp_stock/tools.pkl").expanduser()
+SCHEMA_CACHE_TTL = 3600  # seconds
+
+def schema_cached(method):
+    """Cache a schema listing method's response on disk across client runs
+    
+    Entries are keyed by method name, server script path and the script's
+    mtime, so editing the server invalidates them. Set
+    MCPClient.refresh_schema to bypass the cache and rewrite it.
+    """
+    @functools.wraps(method)
+    async def wrapper(self):
+        server_path = os.path.abspath(self.server_script)
+        try:
+            key = (method.__name__, server_path, os.path.getmtime(server_path))
+        except OSError:
+            return await method(self)
+        
+        try:
+            with open(SCHEMA_CACHE_PATH, "rb") as f:
+                entries = pickle.load(f)
+        except Exception:  # Missing, truncated or foreign cache file
+            entries = {}
+        if not isinstance(entries, dict):
+            entries = {}
+        
+        # Anything not shaped like our (timestamp, response) entries is a miss
+        entry = None if self.refresh_schema else entries.get(key)
+        if (isinstance(entry, tuple) and len(entry) == 2
+                and isinstance(entry[0], (int, float)) and isinstance(entry[1], dict)):
+            cached_at, response = entry
+            if time.time() - cached_at < SCHEMA_CACHE_TTL:
+                return response
+        
+        response = await method(self)
+        if "result" in response:
+            entries[key] = (time.time(), response)
+            try:
+                SCHEMA_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+                with open(SCHEMA_CACHE_PATH, "wb") as f:
+                    pickle.dump(entries, f, protocol=pickle.HIGHEST_PROTOCOL)
+            except OSError:
+                pass  # Disk cache is best-effort
+        return response
+    return wrapper
+
+# Sorted known symbols (bytes), loaded from tickers.npy on first use
+TICKER_LIST_PATH = "tickers.npy"
+_TICKERS = None
+
+def is_known_ticker(ticker: str) -> bool:
+    """Check ticker against the bundled symbol list with a binary search
+    
+    Returns True when no list is available (run setup_script.py to create
+    it) and for index/currency/futures symbols, which the list doesn't cover.
+    """
+    global _TICKERS
+    if any(c in ticker for c in "^=."):
+        return True
+    if _TICKERS is None:
+        try:
+            import numpy as np
+            _TICKERS = np.load(TICKER_LIST_PATH)
+        except (ImportError, OSError, ValueError):
+            _TICKERS = ()
+    if len(_TICKERS) == 0:
+        return True
+    
+    import numpy as np
+    key = ticker.encode()
+    idx = np.searchsorted(_TICKERS, key)
+    return idx < len(_TICKERS) and _TICKERS[idx] == key
+
+class AsyncLRUCache:
+    """Small LRU cache for coroutine results, keyed by a hashable tuple"""
+    
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = None  # Created lazily inside the running event loop
+    
+    async def get_or_call(self, key, factory, should_cache=lambda value: True):
+        """Return the cached value for key, or await factory() and cache it"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            
+            value = await factory()
+            if should_cache(value):
+                self._entries[key] = value
+                if len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+            return value
+    
+    def clear(self):
+        """Drop all cached entries"""
+        self._entries.clear()
+
 class MCPClient:
-    def __init__(self, server_script: str):
-        """Initialize MCP client with server script path"""
+    def __init__(self, server_script: str, framed: bool = False, refresh_schema: bool = False):
+        """Initialize MCP client with server script path
+
+        Args:
+            server_script: Path to the MCP server script
+            framed: Opt-in length-prefixed frames (decimal byte count, newline,
+                body) instead of newline-delimited JSON. The stock FastMCP
+                stdio server does not speak this; the server side has to be
+                switched to match.
+            refresh_schema: Ignore the on-disk tools/resources listing cache
+        """
         self.server_script = server_script
+        self.framed = framed
+        self.refresh_schema = refresh_schema
         self.process = None
+        self.tool_cache = AsyncLRUCache(maxsize=256)
     
     async def start_server(self):
         """Start the MCP server process"""
@@ -21,7 +187,8 @@ class MCPClient:
             'python', self.server_script,
             stdin=asyncio.subprocess.PIPE,
             stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
+            stderr=asyncio.subprocess.PIPE,
+            limit=STREAM_LIMIT
         )
         print("🚀 MCP Server started!")
     
@@ -34,15 +201,11 @@ class MCPClient:
             "params": params
         }
         
-        request_json = json.dumps(request) + '\n'
-        self.process.stdin.write(request_json.encode())
+        self.process.stdin.write(encode_message(request, self.framed))
         await self.process.stdin.drain()
         
         # Read response
-        response_line = await self.process.stdout.readline()
-        response = json.loads(response_line.decode().strip())
-        
-        return response
+        return await read_message(self.process.stdout, self.framed)
     
     async def call_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
         """Call a specific tool on the MCP server"""
@@ -52,10 +215,21 @@ class MCPClient:
         }
         return await self.send_request("tools/call", params)
     
+    async def call_tool_cached(self, tool_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """Call a tool, reusing the last successful response for identical arguments"""
+        key = (tool_name, tuple(sorted(arguments.items())))
+        return await self.tool_cache.get_or_call(
+            key,
+            lambda: self.call_tool(tool_name, arguments),
+            should_cache=lambda response: "result" in response and "error" not in response["result"]
+        )
+    
+    @schema_cached
     async def list_tools(self) -> Dict[str, Any]:
         """List available tools on the server"""
         return await self.send_request("tools/list", {})
     
+    @schema_cached
     async def list_resources(self) -> Dict[str, Any]:
         """List available resources on the server"""
         return await self.send_request("resources/list", {})
@@ -72,9 +246,9 @@ class MCPClient:
             await self.process.wait()
             print("🛑 MCP Server stopped!")
 
-async def demo_stock_analysis():
+async def demo_stock_analysis(refresh_schema: bool = False):
     """Demonstrate stock analysis using MCP server"""
-    client = MCPClient("stock_server.py")
+    client = MCPClient("stock_server.py", refresh_schema=refresh_schema)
     
     try:
         await client.start_server()
@@ -87,8 +261,10 @@ async def demo_stock_analysis():
         print("\n1️⃣ Listing available tools...")
         tools_response = await client.list_tools()
         if "result" in tools_response:
-            for tool in tools_response["result"]["tools"]:
-                print(f"   🔧 {tool['name']}: {tool['description']}")
+            sys.stdout.write("".join(
+                f"   🔧 {tool['name']}: {tool['description']}\n"
+                for tool in tools_response["result"]["tools"]
+            ))
         
         # Get stock data for Apple
         print("\n2️⃣ Getting Apple (AAPL) stock data...")
@@ -101,12 +277,14 @@ async def demo_stock_analysis():
         
         if "result" in apple_data:
             data = apple_data["result"]
-            print(f"   📈 {data['name']} ({data['ticker']})")
-            print(f"   💰 Opening Price: ${data['opening_price']}")
-            print(f"   💰 Closing Price: ${data['closing_price']}")
-            print(f"   📊 Price Change: ${data['price_change']}")
-            print(f"   📈 Percentage Change: {data['percentage_change']}%")
-            print(f"   📊 Data Points: {data['data_points']}")
+            sys.stdout.write("\n".join([
+                f"   📈 {data['name']} ({data['ticker']})",
+                f"   💰 Opening Price: ${data['opening_price']}",
+                f"   💰 Closing Price: ${data['closing_price']}",
+                f"   📊 Price Change: ${data['price_change']}",
+                f"   📈 Percentage Change: {data['percentage_change']}%",
+                f"   📊 Data Points: {data['data_points']}"
+            ]) + "\n")
         else:
             print(f"   ❌ Error: {apple_data.get('error', 'Unknown error')}")
         
@@ -122,19 +300,25 @@ async def demo_stock_analysis():
         if "result" in comparison:
             comp = comparison["result"]
             if "error" not in comp:
-                print(f"   🏆 Better Performer: {comp['better_performer']}")
-                print(f"   📊 Performance Difference: {comp['performance_difference']}%")
-                print(f"   📈 {comp['stock1']['ticker']}: {comp['stock1']['percentage_change']}%")
-                print(f"   📈 {comp['stock2']['ticker']}: {comp['stock2']['percentage_change']}%")
+                sys.stdout.write("\n".join([
+                    f"   🏆 Better Performer: {comp['better_performer']}",
+                    f"   📊 Performance Difference: {comp['performance_difference']}%",
+                    f"   📈 {comp['stock1']['ticker']}: {comp['stock1']['percentage_change']}%",
+                    f"   📈 {comp['stock2']['ticker']}: {comp['stock2']['percentage_change']}%"
+                ]) + "\n")
             else:
                 print(f"   ❌ Comparison Error: {comp['error']}")
         
-        # Read stock resource
-        print("\n4️⃣ Reading Apple stock resource...")
+        # Read stock resources: the quote, then the company profile
+        print("\n4️⃣ Reading Apple stock resources...")
         resource = await client.read_resource("stock://data/AAPL")
         if "result" in resource:
-            print("   📋 Company Information:")
+            print("   💵 Quote:")
             print(resource["result"]["contents"][0]["text"])
+        profile = await client.read_resource("stock://profile/AAPL")
+        if "result" in profile:
+            print("   📋 Company Information:")
+            print(profile["result"]["contents"][0]["text"])
         
         # Generate plot (this will return base64 data)
         print("\n5️⃣ Generating Apple stock plot...")
@@ -159,14 +343,14 @@ async def demo_stock_analysis():
     finally:
         await client.stop_server()
 
-async def interactive_mode():
+async def interactive_mode(validate_tickers: bool = True):
     """Interactive mode for testing different stocks"""
     client = MCPClient("stock_server.py")
     
     try:
         await client.start_server()
         print("\n🔄 Interactive MCP Stock Server Mode")
-        print("Type 'quit' to exit")
+        print("Type 'quit' to exit, 'refresh' to clear cached results")
         
         while True:
             print("\n" + "-"*30)
@@ -175,14 +359,23 @@ async def interactive_mode():
             if ticker == 'QUIT':
                 break
             
+            if ticker == 'REFRESH':
+                client.tool_cache.clear()
+                print("🔄 Cleared cached results")
+                continue
+            
             if not ticker:
                 continue
             
+            if validate_tickers and not is_known_ticker(ticker):
+                print(f"❌ Unknown ticker: {ticker} (use --no-validate to skip this check)")
+                continue
+            
             start_date = input("Start date (mmddyyyy, e.g., 01012024): ").strip()
             end_date = input("End date (mmddyyyy, e.g., 12312024): ").strip()
             
             try:
-                result = await client.call_tool("get_stock_data", {
+                result = await client.call_tool_cached("get_stock_data", {
                     "ticker": ticker,
                     "name": f"{ticker} Analysis",
                     "start_date": start_date,
@@ -210,9 +403,7 @@ async def interactive_mode():
         await client.stop_server()
 
 if __name__ == "__main__":
-    import sys
-    
     if len(sys.argv) > 1 and sys.argv[1] == "interactive":
-        asyncio.run(interactive_mode())
+        asyncio.run(interactive_mode(validate_tickers="--no-validate" not in sys.argv))
     else:
-        asyncio.run(demo_stock_analysis())
+        asyncio.run(demo_stock_analysis(refresh_schema="--refresh-schema" in sys.argv))
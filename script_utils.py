@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Helpers shared by the setup and debugging scripts
+Importing this module has no side effects (no logging setup, no backend
+selection), so any script can use it
+"""
+
+import json
+
+try:
+    import orjson
+
+    def dump_json(obj, f):
+        """Write obj as indented JSON to a file opened in binary mode"""
+        f.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE))
+except ImportError:  # Fall back to the stdlib encoder
+    def dump_json(obj, f):
+        """Write obj as indented JSON to a file opened in binary mode"""
+        f.write(json.dumps(obj, indent=2).encode() + b"\n")
+
+def parse_dates_bulk(arr):
+    """Vectorized mmddyyyy parser for an array of fixed-width 8-byte strings.
+
+    The digits are validated and assembled into month/day/year with NumPy
+    integer ops instead of one Python int() call per field, then pandas
+    checks calendar validity for the whole batch in one go.
+
+    Args:
+        arr: np.ndarray with dtype 'S8' (e.g. np.array(['01012024'], dtype='S8'))
+
+    Returns:
+        (valid, parsed): a boolean mask of entries that are real mmddyyyy
+        dates, and their datetime64[ns] values (NaT where not valid)
+    """
+    import numpy as np
+    import pandas as pd
+
+    arr = np.ascontiguousarray(arr, dtype='S8')
+    # uint8 subtraction wraps, so anything below '0' (incl. NUL padding) ends up >= 10
+    b = arr.view(np.uint8).reshape(-1, 8) - ord('0')
+    valid = np.all(b < 10, axis=1)
+
+    # Columns are month, day, year: mm -> [10, 1], dd -> [10, 1], yyyy -> [1000, 100, 10, 1]
+    weights = np.zeros((8, 3), dtype=np.int32)
+    weights[[0, 1], 0] = [10, 1]
+    weights[[2, 3], 1] = [10, 1]
+    weights[[4, 5, 6, 7], 2] = [1000, 100, 10, 1]
+    month, day, year = (b.astype(np.int32) @ weights).T
+
+    # Rows with bad digits hold garbage fields (pandas would happily carry a
+    # wrapped day into the month), so parse a placeholder date for them and
+    # blank those rows to NaT afterwards
+    year = np.where(valid, year, 1970)
+    month = np.where(valid, month, 1)
+    day = np.where(valid, day, 1)
+    parsed = pd.to_datetime({'year': year, 'month': month, 'day': day}, errors='coerce')
+    parsed = np.where(valid, parsed.to_numpy(), np.datetime64('NaT'))
+    # Calendar-invalid dates (e.g. month 13) were coerced to NaT by pandas
+    return valid & ~np.isnat(parsed), parsed
@@ -7,9 +7,11 @@ This script helps with installation and verification
 import subprocess
 import sys
 import os
-import json
+import importlib.util
 from datetime import datetime, timedelta
 
+from script_utils import dump_json
+
 def install_requirements():
     """Install required packages"""
     requirements = [
@@ -17,20 +19,33 @@ def install_requirements():
         "yfinance>=0.2.28",
         "matplotlib>=3.8.0",
         "pandas>=2.1.0", 
-        "numpy>=1.26.0"
+        "numpy>=1.26.0",
+        "orjson>=3.9.10",
+        "requests-cache>=1.1.1"
     ]
     
+    pip_args = [sys.executable, "-m", "pip", "install",
+                "--disable-pip-version-check", "--no-input", "--prefer-binary"]
+    # Keep downloaded wheels around so re-running setup is cheap
+    env = dict(os.environ)
+    env.setdefault("PIP_CACHE_DIR", os.path.expanduser("~/.cache/mcp_stock/pip"))
+    
     print("📦 Installing required packages...")
+    try:
+        # One pip run: a single resolver pass for all requirements
+        subprocess.check_call(pip_args + requirements, env=env)
+        print("✅ All packages installed successfully!")
+        return True
+    except subprocess.CalledProcessError:
+        print("❌ Combined install failed, retrying one by one to find the culprit...")
+    
     for requirement in requirements:
         try:
-            subprocess.check_call([sys.executable, "-m", "pip", "install", requirement])
+            subprocess.check_call(pip_args + [requirement], env=env)
             print(f"✅ Installed: {requirement}")
         except subprocess.CalledProcessError:
             print(f"❌ Failed to install: {requirement}")
-            return False
-    
-    print("✅ All packages installed successfully!")
-    return True
+    return False
 
 def verify_installation():
     """Verify that all required packages are installed"""
@@ -40,10 +55,10 @@ def verify_installation():
     all_good = True
     
     for package in packages:
-        try:
-            __import__(package)
+        # Locate the package without running its (slow) top-level import code
+        if importlib.util.find_spec(package) is not None:
             print(f"✅ {package} is available")
-        except ImportError:
+        else:
             print(f"❌ {package} is NOT available")
             all_good = False
     
@@ -63,8 +78,8 @@ def create_test_config():
         }
     }
     
-    with open("test_config.json", "w") as f:
-        json.dump(config, f, indent=2)
+    with open("test_config.json", "wb") as f:
+        dump_json(config, f)
     
     print("✅ Created test_config.json")
 
@@ -76,6 +91,7 @@ def run_basic_tests():
     try:
         from datetime import datetime
         import yfinance as yf
+        from ticker_cache import get_fast_info, get_info
         print("✅ Test 1: Imports successful")
     except Exception as e:
         print(f"❌ Test 1: Import failed - {e}")
@@ -83,9 +99,12 @@ def run_basic_tests():
     
     # Test 2: Yahoo Finance connectivity
     try:
-        stock = yf.Ticker("AAPL")
-        info = stock.info
-        if info and 'longName' in info:
+        try:
+            connected = get_fast_info("AAPL").last_price is not None
+        except Exception:
+            info = get_info("AAPL")
+            connected = bool(info) and 'longName' in info
+        if connected:
             print("✅ Test 2: Yahoo Finance connectivity working")
         else:
             print("⚠️ Test 2: Yahoo Finance connectivity limited")
@@ -94,14 +113,11 @@ def run_basic_tests():
     
     # Test 3: Date parsing
     try:
-        from datetime import datetime
-        test_date = "01152024"
-        month = test_date[:2]
-        day = test_date[2:4]
-        year = test_date[4:]
-        dt = datetime(int(year), int(month), int(day))
-        formatted = dt.strftime('%Y-%m-%d')
-        if formatted == "2024-01-15":
+        import numpy as np
+        from script_utils import parse_dates_bulk
+        valid, parsed = parse_dates_bulk(np.array(["01152024"], dtype='S8'))
+        formatted = np.datetime_as_string(parsed, unit='D')[0]
+        if valid[0] and formatted == "2024-01-15":
             print("✅ Test 3: Date parsing working")
         else:
             print("❌ Test 3: Date parsing failed")
@@ -110,6 +126,41 @@ def run_basic_tests():
     
     return True
 
+def create_ticker_list(path="tickers.npy"):
+    """Download the NASDAQ/NYSE symbol directories into a sorted tickers.npy
+    
+    The interactive client uses this list to reject unknown tickers locally
+    instead of round-tripping a typo to Yahoo Finance.
+    """
+    import urllib.request
+    import numpy as np
+    
+    sources = [
+        "https://www.nasdaqtrader.com/dynamic/SymDir/nasdaqlisted.txt",
+        "https://www.nasdaqtrader.com/dynamic/SymDir/otherlisted.txt"
+    ]
+    
+    symbols = set()
+    try:
+        for url in sources:
+            with urllib.request.urlopen(url, timeout=30) as response:
+                lines = response.read().decode("utf-8", "replace").splitlines()
+            # Pipe-delimited: header row, symbol in the first column, footer row
+            for line in lines[1:]:
+                if line.startswith("File Creation Time"):
+                    continue
+                symbol = line.split("|", 1)[0].strip()
+                if symbol:
+                    # Yahoo writes share classes as BRK-B rather than BRK.B
+                    symbols.add(symbol.replace(".", "-"))
+    except Exception as e:
+        print(f"⚠️ Could not download ticker list ({e}); ticker validation disabled")
+        return False
+    
+    np.save(path, np.array(sorted(symbols), dtype="S"))
+    print(f"✅ Created {path} ({len(symbols)} symbols)")
+    return True
+
 def create_sample_usage():
     """Create sample usage documentation"""
     usage = """
@@ -179,6 +230,7 @@ python example_client.py interactive
 
 ## Available Resources  
 - stock://data/{ticker} - Get current stock information
+- stock://profile/{ticker} - Get company name, sector and industry
 """
     
     with open("USAGE.md", "w") as f:
@@ -204,6 +256,7 @@ def main():
     # Step 3: Create test files
     create_test_config()
     create_sample_usage()
+    create_ticker_list()
     
     # Step 4: Run basic tests
     if not run_basic_tests():
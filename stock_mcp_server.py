@@ -1,28 +1,295 @@
+import os
+# Headless only: never let anything probe for a GUI backend
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
 from mcp.server.fastmcp import FastMCP
+import asyncio
+import contextlib
+import functools
+import numbers
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
 import yfinance as yf
-import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
-from datetime import datetime
 import io
 import base64
 
 mcp = FastMCP("stock_server")
 
+# Shared HTTP cache so repeated tool calls for the same ticker/dates don't
+# re-download from Yahoo (optional: plain yfinance sessions without it)
+CACHE_DIR = os.path.expanduser("~/.cache/mcp_stock")
+CACHE_TTL = 3600  # seconds before cached Yahoo data that may still change is refetched
+try:
+    import requests_cache
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    session = requests_cache.CachedSession(
+        os.path.join(CACHE_DIR, "yf_cache"),
+        backend='sqlite',
+        expire_after=CACHE_TTL
+    )
+except ImportError:
+    session = None
+
+if session is not None:
+    # Newer yfinance (curl_cffi based) rejects caching sessions as soon as a
+    # Ticker is built; fall back to its own session there. Building a Ticker
+    # makes no request.
+    try:
+        yf.Ticker("AAPL", session=session)
+    except Exception:
+        session = None
+
+# Days per month for calendar validation (February handled separately)
+_DAYS_IN_MONTH = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+@functools.lru_cache(maxsize=1024)
 def parse_date(date_str: str) -> str:
     """Convert mmddyyyy format to yyyy-mm-dd format for yfinance"""
+    # Check the shape up front instead of relying on int() raising
+    if len(date_str) != 8 or not (date_str.isascii() and date_str.isdigit()):
+        raise ValueError(f"Invalid date format: {date_str}. Expected mmddyyyy format.")
+    
+    # Parse mmddyyyy format
+    mm, dd, yyyy = date_str[:2], date_str[2:4], date_str[4:]
+    month, day, year = int(mm), int(dd), int(yyyy)
+    
+    # Validate the calendar date with plain integer checks
+    leap = year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+    if 1 <= month <= 12:
+        max_day = 29 if month == 2 and leap else _DAYS_IN_MONTH[month - 1]
+    else:
+        max_day = 0
+    if year < 1 or not 1 <= day <= max_day:
+        raise ValueError(f"Invalid date format: {date_str}. Expected mmddyyyy format.")
+    
+    # Return in yyyy-mm-dd format
+    return f"{yyyy}-{mm}-{dd}"
+
+# yf.download keeps its results in module-global state (yfinance.shared) while
+# it waits for its tickers, so two overlapping calls on pool threads could
+# clobber each other's results; serialize them
+_DOWNLOAD_LOCK = threading.Lock()
+
+def _fetch_many(tickers: list, start: str, end: str) -> dict:
+    """Download price history for several tickers in one batched Yahoo request.
+    
+    Args:
+        tickers: Ticker symbols to fetch
+        start: Start date in yyyy-mm-dd format
+        end: End date in yyyy-mm-dd format
+    
+    Returns:
+        Dictionary mapping each (upper-cased) ticker to its own DataFrame
+    """
+    symbols = list(dict.fromkeys(t.upper() for t in tickers))
+    with _DOWNLOAD_LOCK:
+        data = yf.download(tickers=" ".join(symbols), start=start, end=end,
+                           group_by='ticker', auto_adjust=True, threads=True, progress=False,
+                           session=session)
+    
+    # Older yfinance returns a single symbol with flat columns instead of
+    # (ticker, field); newer versions keep the MultiIndex, so check the frame
+    if not isinstance(data.columns, pd.MultiIndex):
+        return {symbols[0]: data.dropna(how='all')}
+    
+    downloaded = set(data.columns.get_level_values(0))
+    return {
+        symbol: data[symbol].dropna(how='all') if symbol in downloaded else pd.DataFrame()
+        for symbol in symbols
+    }
+
+# Fetched history shared by all tools: (TICKER, start, end) -> (expiry, OHLCV
+# DataFrame). Cached frames are shared between callers, so treat them as read-only.
+HISTORY_CACHE_SIZE = 128
+_history_cache = OrderedDict()
+# (TICKER, start, end) -> [asyncio.Lock, number of tasks holding/waiting on it]
+_history_locks = {}
+
+HISTORY_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+# High/Low are stored as float32 to halve their memory. They only feed the
+# reported period high/low, whose 2-decimal rounding can differ from float64
+# only for a price within float32 spacing (~1.5e-5 near $150) of a half cent.
+# Above 2**16 that spacing gets too coarse for cents, so such frames stay
+# float64. Open/Close feed every other reported figure (opening/closing
+# price, changes, average) and always stay float64.
+PRICE_DTYPES = {'High': 'float32', 'Low': 'float32'}
+FLOAT32_PRICE_LIMIT = 2 ** 16
+
+def _prepare_history(data: pd.DataFrame) -> pd.DataFrame:
+    """Trim a fetched frame to HISTORY_COLUMNS, float32 High/Low, contiguous columns.
+    
+    Volume keeps its 64-bit integer type: adjusted daily volumes can exceed
+    the int32 range.
+    
+    Column reductions (max/min/mean) are only cache friendly if each column's
+    values sit next to each other; if any column comes back strided (e.g. a
+    row-major block sliced out of a yf.download frame), rebuild the frame
+    from contiguous per-column arrays.
+    """
+    if data.empty:
+        return data
+    data = data[HISTORY_COLUMNS]
+    if data['High'].max() < FLOAT32_PRICE_LIMIT:
+        data = data.astype(PRICE_DTYPES)
+    columns = {c: data[c].to_numpy() for c in HISTORY_COLUMNS}
+    if not all(values.flags.c_contiguous for values in columns.values()):
+        data = pd.DataFrame(
+            {c: np.ascontiguousarray(values) for c, values in columns.items()},
+            index=data.index
+        )
+    return data
+
+def _cache_get(key):
+    entry = _history_cache.get(key)
+    if entry is None:
+        return None
+    expires, data = entry
+    if expires is not None and time.monotonic() >= expires:
+        del _history_cache[key]
+        return None
+    _history_cache.move_to_end(key)
+    return data
+
+def _cache_put(key, data: pd.DataFrame):
+    # Empty results are not cached so a transient Yahoo hiccup isn't sticky
+    if data.empty:
+        return
+    # A range reaching (roughly) today can still gain or revise bars, so it
+    # expires like the HTTP cache; fully historical ranges are kept until
+    # evicted. One day of slack covers the server/exchange timezone gap.
+    end = key[2]
+    if end >= (date.today() - timedelta(days=1)).isoformat():
+        expires = time.monotonic() + CACHE_TTL
+    else:
+        expires = None
+    _history_cache[key] = (expires, data)
+    _history_cache.move_to_end(key)
+    if len(_history_cache) > HISTORY_CACHE_SIZE:
+        _history_cache.popitem(last=False)
+
+@contextlib.asynccontextmanager
+async def _history_lock(key):
+    """Hold the per-key history lock, dropping it once no task uses it"""
+    entry = _history_locks.get(key)
+    if entry is None:
+        entry = _history_locks[key] = [asyncio.Lock(), 0]
+    entry[1] += 1
     try:
-        # Parse mmddyyyy format
-        month = date_str[:2]
-        day = date_str[2:4]
-        year = date_str[4:]
+        async with entry[0]:
+            yield
+    finally:
+        # Runs even when the download raised, so failed keys don't leak locks
+        entry[1] -= 1
+        if entry[1] == 0:
+            del _history_locks[key]
+
+async def _fetch(ticker: str, start: str, end: str) -> pd.DataFrame:
+    """Fetch OHLCV history for one ticker, shared across tools.
+    
+    Concurrent calls for the same key wait on a per-key lock, so the data is
+    downloaded once and later calls are served from the in-process cache
+    (ranges ending around today expire after CACHE_TTL).
+    
+    Args:
+        ticker: The stock ticker symbol
+        start: Start date in yyyy-mm-dd format
+        end: End date in yyyy-mm-dd format
+    """
+    key = (ticker.upper(), start, end)
+    async with _history_lock(key):
+        data = _cache_get(key)
+        if data is None:
+            # Blocking HTTP, so run it on the thread pool
+            stock = yf.Ticker(ticker, session=session)
+            data = await asyncio.get_running_loop().run_in_executor(
+                None, lambda: stock.history(start=start, end=end, actions=False)
+            )
+            data = _prepare_history(data)
+            _cache_put(key, data)
+    return data
+
+async def _fetch_batch(tickers: list, start: str, end: str) -> dict:
+    """Like _fetch for several tickers; cache misses share one yf.download request"""
+    # Take every key's lock (in sorted order, so concurrent batches can't
+    # deadlock) before checking the cache, like _fetch does for one key
+    symbols = sorted(set(t.upper() for t in tickers))
+    async with contextlib.AsyncExitStack() as locks:
+        for symbol in symbols:
+            await locks.enter_async_context(_history_lock((symbol, start, end)))
         
-        # Convert to datetime to validate
-        dt = datetime(int(year), int(month), int(day))
+        frames = {}
+        missing = []
+        for symbol in symbols:
+            data = _cache_get((symbol, start, end))
+            if data is None:
+                missing.append(symbol)
+            else:
+                frames[symbol] = data
         
-        # Return in yyyy-mm-dd format
-        return dt.strftime('%Y-%m-%d')
-    except (ValueError, IndexError):
-        raise ValueError(f"Invalid date format: {date_str}. Expected mmddyyyy format.")
+        if missing:
+            downloaded = await asyncio.get_running_loop().run_in_executor(
+                None, _fetch_many, missing, start, end
+            )
+            for symbol, data in downloaded.items():
+                data = _prepare_history(data)
+                _cache_put((symbol, start, end), data)
+                frames[symbol] = data
+    return frames
+
+class NoDataError(Exception):
+    """Raised when Yahoo Finance has no rows for a ticker and date range"""
+
+async def _get_stock_df(ticker: str, start: str, end: str) -> pd.DataFrame:
+    """Fetch (cached) history for ticker, raising NoDataError when there is none.
+    
+    Args:
+        ticker: The stock ticker symbol
+        start: Start date in yyyy-mm-dd format
+        end: End date in yyyy-mm-dd format
+    """
+    data = await _fetch(ticker, start, end)
+    if data.empty:
+        raise NoDataError(f"No data found for ticker {ticker} in the specified date range")
+    return data
+
+def _performance_stats(data: pd.DataFrame) -> dict:
+    """Price/percentage change and final price over a history frame"""
+    opening = float(data['Open'].iloc[0])
+    closing = float(data['Close'].iloc[-1])
+    return {
+        "percentage_change": round(((closing / opening) - 1) * 100, 2),
+        "price_change": round(closing - opening, 2),
+        "final_price": round(closing, 2)
+    }
+
+def _summary_stats(data: pd.DataFrame) -> dict:
+    """Full get_stock_data statistics over a history frame"""
+    # Pull each column out as a NumPy array once, then reduce on the arrays
+    opn = data['Open'].to_numpy()
+    close = data['Close'].to_numpy()
+    high = data['High'].to_numpy()
+    low = data['Low'].to_numpy()
+    volume = data['Volume'].to_numpy()
+    first_open = float(opn[0])
+    last_close = float(close[-1])
+    
+    # nan-aware, like the pandas reductions. High/Low may be float32 (see
+    # PRICE_DTYPES), so convert results to Python floats before rounding.
+    return {
+        "data_points": len(data),
+        "opening_price": round(first_open, 2),
+        "closing_price": round(last_close, 2),
+        "highest_price": round(float(np.nanmax(high)), 2),
+        "lowest_price": round(float(np.nanmin(low)), 2),
+        "average_price": round(float(np.nanmean(close)), 2),
+        "price_change": round(last_close - first_open, 2),
+        "percentage_change": round(((last_close / first_open) - 1) * 100, 2),
+        "average_volume": int(np.nanmean(volume))
+    }
 
 @mcp.tool()
 async def get_stock_data(ticker: str, name: str, start_date: str, end_date: str) -> dict:
@@ -42,36 +309,19 @@ async def get_stock_data(ticker: str, name: str, start_date: str, end_date: str)
         start_formatted = parse_date(start_date)
         end_formatted = parse_date(end_date)
         
-        # Fetch data from Yahoo Finance
-        stock = yf.Ticker(ticker)
-        data = stock.history(start=start_formatted, end=end_formatted)
+        # Fetch data from Yahoo Finance (shared with the other tools)
+        data = await _get_stock_df(ticker, start_formatted, end_formatted)
         
-        if data.empty:
-            return {
-                "error": f"No data found for ticker {ticker} in the specified date range",
-                "ticker": ticker,
-                "name": name
-            }
-        
-        # Calculate basic statistics
-        stats = {
+        return {
             "ticker": ticker,
             "name": name,
             "start_date": start_formatted,
             "end_date": end_formatted,
-            "data_points": len(data),
-            "opening_price": round(data['Open'].iloc[0], 2),
-            "closing_price": round(data['Close'].iloc[-1], 2),
-            "highest_price": round(data['High'].max(), 2),
-            "lowest_price": round(data['Low'].min(), 2),
-            "average_price": round(data['Close'].mean(), 2),
-            "price_change": round(data['Close'].iloc[-1] - data['Open'].iloc[0], 2),
-            "percentage_change": round(((data['Close'].iloc[-1] / data['Open'].iloc[0]) - 1) * 100, 2),
-            "average_volume": int(data['Volume'].mean())
+            **_summary_stats(data)
         }
         
-        return stats
-        
+    except NoDataError as e:
+        return {"error": str(e), "ticker": ticker, "name": name}
     except Exception as e:
         return {
             "error": f"Failed to fetch data: {str(e)}",
@@ -79,8 +329,156 @@ async def get_stock_data(ticker: str, name: str, start_date: str, end_date: str)
             "name": name
         }
 
+# Plots with more rows than this are thinned to roughly PLOT_DOWNSAMPLE_TARGET
+MAX_PLOT_POINTS = 5000
+PLOT_DOWNSAMPLE_TARGET = 2000
+
+# One Figure/canvas reused by every matplotlib plot (created on first use).
+# Plots render on the thread pool, so it is guarded by _PLOT_LOCK: a figure
+# can only draw one chart at a time
+_FIG = _CANVAS = _AX1 = _AX2 = None
+_PLOT_LOCK = threading.Lock()
+
+def _plot_figure(dpi: int):
+    """Return the shared (figure, canvas, price_ax, volume_ax), cleared for a new chart"""
+    global _FIG, _CANVAS, _AX1, _AX2
+    if _FIG is None:
+        # Agg canvas + Figure only (no pyplot), imported on first plot so the
+        # server starts without loading matplotlib at all
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        _FIG = Figure(figsize=(12, 8))
+        _CANVAS = FigureCanvasAgg(_FIG)
+        _AX1, _AX2 = _FIG.subplots(2, 1)
+    else:
+        _AX1.clear()
+        _AX2.clear()
+    # JPEG and PNG plots use different resolutions
+    _FIG.set_dpi(dpi)
+    return _FIG, _CANVAS, _AX1, _AX2
+
+def _render_matplotlib(idx, opn, close, volume, title: str, dpi: int):
+    """Render the price + volume chart with matplotlib, returning a PIL image
+    
+    Draws on the shared figure: callers must hold _PLOT_LOCK until they are
+    done with the returned image, which views the canvas buffer.
+    """
+    from PIL import Image
+    
+    # Object-oriented API on the reused figure: no new Figure, Axes or Agg
+    # buffer per call, and no pyplot global figure registry to leak into
+    fig, canvas, price_ax, volume_ax = _plot_figure(dpi)
+    
+    # Plot closing price
+    price_ax.plot(idx, close, linewidth=2, color='blue', label='Close Price')
+    price_ax.plot(idx, opn, linewidth=1, color='green', alpha=0.7, label='Open Price')
+    price_ax.set_title(title, fontsize=14, fontweight='bold')
+    price_ax.set_ylabel('Price ($)', fontsize=12)
+    price_ax.legend()
+    price_ax.grid(True, alpha=0.3)
+    
+    # Plot volume
+    # One filled path instead of a Rectangle artist per bar
+    volume_ax.fill_between(idx, 0, volume, step='mid', alpha=0.6,
+                           color='orange', linewidth=0, label='Volume')
+    volume_ax.set_title('Trading Volume', fontsize=12, fontweight='bold')
+    volume_ax.set_ylabel('Volume', fontsize=12)
+    volume_ax.set_xlabel('Date', fontsize=12)
+    volume_ax.legend()
+    volume_ax.grid(True, alpha=0.3)
+    
+    # Fixed margins instead of tight_layout(), which needs an extra
+    # measuring draw; the canvas is then rasterized exactly once below
+    fig.subplots_adjust(left=0.08, right=0.98, top=0.91, bottom=0.08, hspace=0.35)
+    
+    # Rasterize once and hand the RGBA pixels straight to Pillow,
+    # bypassing matplotlib's savefig/print_figure pipeline
+    canvas.draw()
+    return Image.fromarray(np.asarray(canvas.buffer_rgba()), 'RGBA')
+
+def _render_pil(idx, opn, close, volume, title: str, dpi: int):
+    """Render a simplified price + volume chart directly with PIL.ImageDraw
+    
+    No axes machinery, ticks or fonts beyond Pillow's default: just the two
+    price lines, the volume area and a few labels. Much cheaper than
+    matplotlib (and never imports it), at the cost of a plainer chart.
+    """
+    from PIL import Image, ImageDraw, ImageFont
+    
+    # float64 for the pixel math, skipping incomplete rows
+    opn = opn.astype(np.float64)
+    close = close.astype(np.float64)
+    volume = volume.astype(np.float64)
+    keep = ~(np.isnan(opn) | np.isnan(close) | np.isnan(volume))
+    if not keep.all():
+        idx, opn, close, volume = idx[keep], opn[keep], close[keep], volume[keep]
+    width, height = 12 * dpi, 8 * dpi
+    left, right = int(width * 0.08), int(width * 0.98)
+    price_top, price_bottom = int(height * 0.09), int(height * 0.56)
+    volume_top, volume_bottom = int(height * 0.66), int(height * 0.92)
+    
+    image = Image.new('RGB', (width, height), 'white')
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default()
+    
+    # x from timestamps, y scaled into each panel, all vectorized
+    t = idx.astype('datetime64[ns]').astype(np.int64).astype(np.float64)
+    span = (t[-1] - t[0]) or 1.0
+    xs = left + (t - t[0]) / span * (right - left)
+    
+    lo, hi = min(opn.min(), close.min()), max(opn.max(), close.max())
+    price_scale = (price_bottom - price_top) / ((hi - lo) or 1.0)
+    
+    volume_scale = (volume_bottom - volume_top) / (volume.max() or 1.0)
+    
+    # Panel frames
+    draw.rectangle([left, price_top, right, price_bottom], outline='#cccccc')
+    draw.rectangle([left, volume_top, right, volume_bottom], outline='#cccccc')
+    
+    # Volume as one filled polygon
+    volume_ys = volume_bottom - volume * volume_scale
+    draw.polygon([(left, volume_bottom)] + list(zip(xs, volume_ys)) + [(right, volume_bottom)],
+                 fill='#ffc266')
+    
+    # Price lines
+    for values, color, line_width in ((opn, 'green', 1), (close, 'blue', 2)):
+        ys = price_bottom - (values - lo) * price_scale
+        draw.line(list(zip(xs, ys)), fill=color, width=line_width)
+    
+    # Labels
+    draw.text((left, 10), title, fill='black', font=font)
+    draw.text((right - 150, price_top + 5), "Close Price", fill='blue', font=font)
+    draw.text((right - 150, price_top + 20), "Open Price", fill='green', font=font)
+    draw.text((5, price_top), f"${hi:,.2f}", fill='black', font=font)
+    draw.text((5, price_bottom - 12), f"${lo:,.2f}", fill='black', font=font)
+    draw.text((left, volume_top - 15), "Trading Volume", fill='black', font=font)
+    draw.text((5, volume_top), f"{volume.max():,.0f}", fill='black', font=font)
+    draw.text((left, volume_bottom + 5), str(idx[0].astype('datetime64[D]')), fill='black', font=font)
+    draw.text((right - 70, volume_bottom + 5), str(idx[-1].astype('datetime64[D]')), fill='black', font=font)
+    return image
+
+def _encode_image(image, format: str) -> str:
+    """Encode a PIL image as base64 JPEG or PNG"""
+    buffer = io.BytesIO()
+    if format == "jpeg":
+        image.convert('RGB').save(buffer, 'JPEG', quality=85, optimize=True)
+    else:
+        image.save(buffer, 'PNG')
+    # getbuffer() is a zero-copy view of the encoded image; base64 output is pure ASCII
+    return base64.b64encode(buffer.getbuffer()).decode('ascii')
+
+def _draw_plot(render, idx, opn, close, volume, title: str, format: str) -> str:
+    """Render the chart with render and return it base64 encoded (runs on the thread pool)"""
+    dpi = 90 if format == "jpeg" else 150
+    if render is _render_matplotlib:
+        # Held through encoding: the matplotlib image shares the figure's buffer
+        with _PLOT_LOCK:
+            return _encode_image(render(idx, opn, close, volume, title, dpi), format)
+    return _encode_image(render(idx, opn, close, volume, title, dpi), format)
+
 @mcp.tool()
-async def plot_stock_price(ticker: str, name: str, start_date: str, end_date: str) -> str:
+async def plot_stock_price(ticker: str, name: str, start_date: str, end_date: str,
+                           format: str = "jpeg", renderer: str = "matplotlib") -> str:
     """Create a plot of stock prices and return as base64 encoded image.
     
     Args:
@@ -88,55 +486,59 @@ async def plot_stock_price(ticker: str, name: str, start_date: str, end_date: st
         name: A descriptive name for the stock/analysis
         start_date: Start date in mmddyyyy format (e.g., '01012023')
         end_date: End date in mmddyyyy format (e.g., '12312023')
+        format: Image format, 'jpeg' (default, smaller and faster) or 'png'
+        renderer: 'matplotlib' (default, full chart) or 'pil' (plain but
+            much lighter chart drawn directly with Pillow)
     
     Returns:
-        Base64 encoded PNG image of the stock price plot
+        Base64 encoded image data URL of the stock price plot
     """
     try:
+        format = format.lower()
+        if format == "jpg":
+            format = "jpeg"
+        if format not in ("jpeg", "png"):
+            return f"Unsupported image format: {format}. Use 'jpeg' or 'png'."
+        
+        renderers = {"matplotlib": _render_matplotlib, "pil": _render_pil}
+        if renderer not in renderers:
+            return f"Unsupported renderer: {renderer}. Use 'matplotlib' or 'pil'."
+        
         # Parse dates
         start_formatted = parse_date(start_date)
         end_formatted = parse_date(end_date)
         
-        # Fetch data
-        stock = yf.Ticker(ticker)
-        data = stock.history(start=start_formatted, end=end_formatted)
-        
-        if data.empty:
-            return f"No data found for ticker {ticker} in the specified date range"
-        
-        # Create the plot
-        plt.figure(figsize=(12, 8))
-        
-        # Plot closing price
-        plt.subplot(2, 1, 1)
-        plt.plot(data.index, data['Close'], linewidth=2, color='blue', label='Close Price')
-        plt.plot(data.index, data['Open'], linewidth=1, color='green', alpha=0.7, label='Open Price')
-        plt.title(f'{name} ({ticker}) - Stock Price Chart\n{start_formatted} to {end_formatted}', 
-                 fontsize=14, fontweight='bold')
-        plt.ylabel('Price ($)', fontsize=12)
-        plt.legend()
-        plt.grid(True, alpha=0.3)
-        
-        # Plot volume
-        plt.subplot(2, 1, 2)
-        plt.bar(data.index, data['Volume'], alpha=0.6, color='orange', label='Volume')
-        plt.title('Trading Volume', fontsize=12, fontweight='bold')
-        plt.ylabel('Volume', fontsize=12)
-        plt.xlabel('Date', fontsize=12)
-        plt.legend()
-        plt.grid(True, alpha=0.3)
-        
-        plt.tight_layout()
-        
-        # Convert plot to base64 string
-        buffer = io.BytesIO()
-        plt.savefig(buffer, format='png', dpi=150, bbox_inches='tight')
-        buffer.seek(0)
-        plot_base64 = base64.b64encode(buffer.getvalue()).decode()
-        plt.close()
-        
-        return f"data:image/png;base64,{plot_base64}"
+        # Fetch data (shared with get_stock_data, so stats + plot is one download)
+        data = await _get_stock_df(ticker, start_formatted, end_formatted)
+        
+        # Both renderers only need the plotted columns as plain arrays: pull
+        # them out once instead of going through pandas for every access.
+        # Dates become naive datetime64 (exchange-local wall time) rather
+        # than an object array of tz-aware Timestamps.
+        index = data.index
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        idx = index.to_numpy()
+        opn = data['Open'].to_numpy()
+        close = data['Close'].to_numpy()
+        volume = data['Volume'].to_numpy()
+        
+        # Long series have far more points than the chart has pixels
+        if len(idx) > MAX_PLOT_POINTS:
+            step = max(1, len(idx) // PLOT_DOWNSAMPLE_TARGET)
+            idx, opn, close, volume = idx[::step], opn[::step], close[::step], volume[::step]
         
+        title = f'{name} ({ticker}) - Stock Price Chart\n{start_formatted} to {end_formatted}'
+        
+        # Rendering and encoding are CPU bound, so keep them off the event loop
+        plot_base64 = await asyncio.get_running_loop().run_in_executor(
+            None, _draw_plot, renderers[renderer], idx, opn, close, volume, title, format
+        )
+        
+        return f"data:image/{format};base64,{plot_base64}"
+        
+    except NoDataError as e:
+        return str(e)
     except Exception as e:
         return f"Failed to create plot: {str(e)}"
 
@@ -154,69 +556,97 @@ async def compare_stocks(ticker1: str, ticker2: str, start_date: str, end_date:
         Comparison data for both stocks
     """
     try:
-        # Get data for both stocks
-        stock1_data = await get_stock_data(ticker1, ticker1, start_date, end_date)
-        stock2_data = await get_stock_data(ticker2, ticker2, start_date, end_date)
+        start_formatted = parse_date(start_date)
+        end_formatted = parse_date(end_date)
+        
+        # Cached history where available, one batched Yahoo request for the rest
+        frames = await _fetch_batch([ticker1, ticker2], start_formatted, end_formatted)
+        data1 = frames[ticker1.upper()]
+        data2 = frames[ticker2.upper()]
         
-        if 'error' in stock1_data or 'error' in stock2_data:
+        if data1.empty or data2.empty:
+            no_data = "No data found for ticker {} in the specified date range"
             return {
                 "error": "Failed to get data for one or both stocks",
-                "stock1_error": stock1_data.get('error', 'No error'),
-                "stock2_error": stock2_data.get('error', 'No error')
+                "stock1_error": no_data.format(ticker1) if data1.empty else 'No error',
+                "stock2_error": no_data.format(ticker2) if data2.empty else 'No error'
             }
         
+        stock1_data = _performance_stats(data1)
+        stock2_data = _performance_stats(data2)
+        
         comparison = {
-            "comparison_period": f"{parse_date(start_date)} to {parse_date(end_date)}",
-            "stock1": {
-                "ticker": ticker1,
-                "percentage_change": stock1_data['percentage_change'],
-                "price_change": stock1_data['price_change'],
-                "final_price": stock1_data['closing_price']
-            },
-            "stock2": {
-                "ticker": ticker2,
-                "percentage_change": stock2_data['percentage_change'],
-                "price_change": stock2_data['price_change'],
-                "final_price": stock2_data['closing_price']
-            }
+            "comparison_period": f"{start_formatted} to {end_formatted}",
+            "stock1": {"ticker": ticker1, **stock1_data},
+            "stock2": {"ticker": ticker2, **stock2_data}
         }
         
-        # Determine winner
-        if stock1_data['percentage_change'] > stock2_data['percentage_change']:
-            comparison['better_performer'] = ticker1
-            comparison['performance_difference'] = round(
-                stock1_data['percentage_change'] - stock2_data['percentage_change'], 2
-            )
-        else:
-            comparison['better_performer'] = ticker2
-            comparison['performance_difference'] = round(
-                stock2_data['percentage_change'] - stock1_data['percentage_change'], 2
-            )
+        # Determine winner (argmax generalizes directly to N tickers). argmax
+        # picks the first maximum, so run it over the reversed array: ties go
+        # to the later ticker, as ticker2 always won a tie
+        tickers = [ticker1, ticker2]
+        pcts = np.array([stock1_data['percentage_change'], stock2_data['percentage_change']])
+        winner_idx = len(pcts) - 1 - int(np.argmax(pcts[::-1]))
+        comparison['better_performer'] = tickers[winner_idx]
+        comparison['performance_difference'] = round(
+            float(pcts[winner_idx] - np.delete(pcts, winner_idx).max()), 2
+        )
         
         return comparison
         
     except Exception as e:
         return {"error": f"Comparison failed: {str(e)}"}
 
+def _field(source, key: str, fmt: str = "{:,.2f}") -> str:
+    """Format one quote field, 'N/A' when it is missing or not a number
+    
+    Only a missing key is treated as 'N/A': fast_info fetches lazily, so
+    network/Yahoo errors raised here must reach the caller's error handling.
+    """
+    try:
+        value = source[key]
+    except KeyError:
+        value = None
+    return fmt.format(value) if isinstance(value, numbers.Real) else "N/A"
+
 @mcp.resource("stock://data/{ticker}")
 async def read_stock_resource(ticker: str) -> str:
-    """Resource endpoint to get current stock information"""
+    """Resource endpoint to get current stock information
+    
+    Uses yfinance's lightweight fast_info quote; company details (name,
+    sector, industry) live in the stock://profile/{ticker} resource.
+    """
+    def lookup():
+        fi = yf.Ticker(ticker, session=session).fast_info
+        return f"""
+Stock Information for {ticker}:
+Current Price: ${_field(fi, 'lastPrice')}
+Market Cap: ${_field(fi, 'marketCap', '{:,.0f}')}
+52 Week High: ${_field(fi, 'yearHigh')}
+52 Week Low: ${_field(fi, 'yearLow')}
+        """
+    
     try:
-        stock = yf.Ticker(ticker)
-        info = stock.info
+        return await asyncio.get_running_loop().run_in_executor(None, lookup)
+    except Exception as e:
+        return f"Error fetching stock resource: {str(e)}"
+
+@mcp.resource("stock://profile/{ticker}")
+async def read_stock_profile(ticker: str) -> str:
+    """Resource endpoint to get company details (fetches the full, slower info payload)"""
+    try:
+        info = await asyncio.get_running_loop().run_in_executor(
+            None, lambda: yf.Ticker(ticker, session=session).info
+        )
         
         return f"""
-Stock Information for {ticker}:
+Company Profile for {ticker}:
 Company Name: {info.get('longName', 'N/A')}
 Sector: {info.get('sector', 'N/A')}
 Industry: {info.get('industry', 'N/A')}
-Current Price: ${info.get('currentPrice', 'N/A')}
-Market Cap: ${info.get('marketCap', 'N/A'):,}
-52 Week High: ${info.get('fiftyTwoWeekHigh', 'N/A')}
-52 Week Low: ${info.get('fiftyTwoWeekLow', 'N/A')}
         """
     except Exception as e:
-        return f"Error fetching stock resource: {str(e)}"
+        return f"Error fetching stock profile: {str(e)}"
 
 if __name__ == "__main__":
     mcp.run(transport='stdio')
\ No newline at end of file
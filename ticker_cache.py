@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Process-wide cache for Yahoo Finance lookups
+Repeated ticker/info/history requests are served from memory (and from an
+on-disk pickle store for history) instead of going back to Yahoo
+"""
+
+import functools
+import hashlib
+import os
+import pickle
+import time
+from pathlib import Path
+
+try:
+    # yfinance-cache is a drop-in Ticker with its own smart caching
+    import yfinance_cache as yfc
+    Ticker = yfc.Ticker
+except ImportError:
+    import yfinance as yf
+    Ticker = yf.Ticker
+
+CACHE_DIR = Path(os.environ.get("MCP_STOCK_CACHE_DIR", "~/.cache/mcp_stock")).expanduser()
+HISTORY_TTL = 3600  # seconds before an on-disk history entry is refetched
+
+_enabled = True
+
+def set_cache_enabled(enabled: bool):
+    """Turn caching on or off (e.g. for a --no-cache debug run)"""
+    global _enabled
+    _enabled = enabled
+
+@functools.lru_cache(maxsize=512)
+def _cached_ticker(symbol: str):
+    return Ticker(symbol)
+
+def get_ticker(symbol: str):
+    """Return a (shared) Ticker object for symbol"""
+    if not _enabled:
+        return Ticker(symbol)
+    return _cached_ticker(symbol)
+
+@functools.lru_cache(maxsize=512)
+def _cached_info(symbol: str) -> dict:
+    return _cached_ticker(symbol).info
+
+def get_info(symbol: str) -> dict:
+    """Return Ticker(symbol).info, fetched at most once per process"""
+    if not _enabled:
+        return Ticker(symbol).info
+    return _cached_info(symbol)
+
+def get_fast_info(symbol: str):
+    """Return Ticker(symbol).fast_info, the light quote accessor (no company profile)"""
+    return get_ticker(symbol).fast_info
+
+def _history_path(symbol: str, start: str, end: str, interval: str) -> Path:
+    key = hashlib.sha1(repr((symbol, start, end, interval)).encode()).hexdigest()
+    return CACHE_DIR / f"history_{key}.pkl"
+
+@functools.lru_cache(maxsize=512)
+def _cached_history(symbol: str, start: str, end: str, interval: str):
+    path = _history_path(symbol, start, end, interval)
+    try:
+        if time.time() - path.stat().st_mtime < HISTORY_TTL:
+            with open(path, "rb") as f:
+                return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        pass
+
+    data = get_ticker(symbol).history(start=start, end=end, interval=interval)
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+    except OSError:
+        pass  # Disk cache is best-effort
+    return data
+
+def get_history(symbol: str, start: str, end: str, interval: str = "1d"):
+    """Return Ticker(symbol).history(...) keyed on (symbol, start, end, interval)
+
+    Args:
+        symbol: The stock ticker symbol (e.g., 'AAPL')
+        start: Start date in yyyy-mm-dd format
+        end: End date in yyyy-mm-dd format
+        interval: yfinance bar interval (default '1d')
+    """
+    if not _enabled:
+        return Ticker(symbol).history(start=start, end=end, interval=interval)
+    return _cached_history(symbol, str(start), str(end), interval)
+
+def clear_cache():
+    """Drop all in-memory entries (the on-disk store expires via HISTORY_TTL)"""
+    _cached_ticker.cache_clear()
+    _cached_info.cache_clear()
+    _cached_history.cache_clear()